@@ -5,8 +5,8 @@
 This is designed to simulate normal operations, so does not include support
 for things like `--join`ing to an invalid port."""
 
-import atexit, copy, datetime, os, platform, random, re, shutil, signal
-import socket, string, subprocess, sys, tempfile, time, traceback, warnings
+import atexit, copy, datetime, os, platform, re, shutil, signal
+import socket, subprocess, sys, tempfile, threading, time, traceback, warnings
 
 import utils, resunder
 
@@ -255,7 +255,26 @@ class Cluster(object):
     
     def check_and_stop(self):
         '''Check that all servers are running as expected, then stop them all. Throws an error on unexpected exit codes'''
+        
+        # each server can take a while to shut down cleanly, so kill their process groups in parallel;
+        # only the kill runs on the threads, the bookkeeping in Process.check_and_stop stays serial
+        errors = []
+        def killServer(process):
+            try:
+                utils.kill_process_group(process, timeout=20)
+            except Exception:
+                errors.append(sys.exc_info())
+        
         try:
+            stopThreads = [threading.Thread(target=killServer, args=(server.process,), name='kill_process_group') for server in self.processes if server.running]
+            for stopThread in stopThreads:
+                stopThread.start()
+            for stopThread in stopThreads:
+                stopThread.join()
+            if errors:
+                for error in errors:
+                    sys.stderr.write(''.join(traceback.format_exception(*error)))
+                raise errors[0][1]
             for server in self.processes:
                 server.check_and_stop()
         finally:
@@ -430,13 +449,9 @@ class Process(object):
     logfileReadyRegex = re.compile('(Server|Proxy) ready, ("(?P<name>\w+)" )?((?P<uuid>(proxy-)?\w{8}-\w{4}-\w{4}-\w{4}-\w{12}))?$')
     
     @staticmethod
-    def genPath(name, path, extraLetters=3):
-        '''generate a non-existing name with a bit of randomness at the end'''
-        newPath = path # should always exist
-        while os.path.exists(newPath):
-            newPath = '%s_%s' % (os.path.join(path, name), ''.join(random.choice(string.ascii_lowercase) for i in range(extraLetters)))
-        os.mkdir(newPath)
-        return newPath
+    def genPath(name, path):
+        '''create a new directory in path named name with a bit of randomness at the end'''
+        return tempfile.mkdtemp(prefix=name + '_', dir=path)
     
     def subclass_init(self):
         '''Complete init for this subclass.'''
@@ -690,7 +705,7 @@ class Process(object):
         try:
             self._console_file.write("Launching at %s:\n\t%s\n" % (datetime.datetime.now().isoformat(), " ".join(options)))
             self._console_file.flush()
-            self.process = subprocess.Popen(options, stdout=self._console_file, stderr=subprocess.STDOUT, preexec_fn=os.setpgrp)
+            self.process = subprocess.Popen(options, stdout=self._console_file, stderr=subprocess.STDOUT, **utils.new_process_group)
             
             if not self in runningServers:
                 runningServers.append(self)
@@ -150,8 +150,7 @@ def old_tests_mode(all_tests, load, filter, verbose, list_tests, only_failed, tr
     if isinstance(load, "".__class__):
         load_path = load
     else:
-        all_dirs = [join(default_test_results_dir, d) for d in os.listdir(default_test_results_dir)]
-        load_path = max([d for d in all_dirs if os.path.isdir(d)], key=getmtime)
+        load_path = max([join(default_test_results_dir, d) for d in list_subdirs(default_test_results_dir)], key=getmtime)
         print("Loading tests from", load_path)
     tests = load_test_results_as_tests(load_path).filter(filter)
     filter.check_use()
@@ -185,6 +184,12 @@ def old_tests_mode(all_tests, load, filter, verbose, list_tests, only_failed, tr
                     print('===', name, '===')
                     test.dump_file(name)
 
+# List the subdirectories of path, using the file types scandir gets for free when it is available
+def list_subdirs(path):
+    if hasattr(os, 'scandir'):
+        return [entry.name for entry in os.scandir(path) if entry.is_dir()]
+    return [name for name in os.listdir(path) if os.path.isdir(join(path, name))]
+
 def redirect_fd_to_file(fd, file, tee=False):
     if not tee:
         f = open(file, 'w')
@@ -193,6 +198,32 @@ def redirect_fd_to_file(fd, file, tee=False):
         f = tee.stdin
     os.dup2(f.fileno(), fd)
 
+# The same as text.split('\n')[-count:], without splitting all of text
+def tail_lines(text, count):
+    start = len(text)
+    for i in range(count):
+        start = text.rfind('\n', 0, start)
+        if start == -1:
+            return text.split('\n')
+    return text[start + 1:].split('\n')
+
+# The same as tail_lines(open(path).read(), count), reading back from the end of the file only as far as needed
+def tail_file_lines(path, count, block_size=4096):
+    with open(path, 'rb') as f:
+        start = os.fstat(f.fileno()).st_size
+        data = b''
+        newlines = 0
+        while start > 0 and newlines < count:
+            size = min(block_size, start)
+            start -= size
+            f.seek(start)
+            block = f.read(size)
+            newlines += block.count(b'\n')
+            data = block + data
+    if not isinstance(data, str):
+        data = data.decode('utf-8', 'replace')
+    return tail_lines(data, count)
+
 # The main logic for running the tests
 class TestRunner(object):
     SUCCESS   = 'SUCCESS'
@@ -202,7 +233,7 @@ class TestRunner(object):
     KILLED    = 'KILLED'
 
     def __init__(self, tests, conf, tasks=1, timeout=600, output_dir=None, verbose=False, repeat=1, kontinue=False, abort_fast = False, run_dir=None):
-        self.tests = tests
+        self.tests = list(tests) # flatten the tree once rather than walking it on every pass
         self.semaphore = multiprocessing.Semaphore(tasks)
         self.processes = []
         self.timeout = timeout
@@ -512,16 +543,10 @@ class TermView(TextView):
         return ret
 
     def format_running(self, max):
-        ret = ''
-        for i in range(max):
-            if i > 0:
-                ret += ', '
-            ret += self.running_list[i]
+        names = self.running_list[:max]
         if len(self.running_list) > max:
-            if max > 0:
-                ret += ', '
-            ret += "..."
-        return ret
+            names.append("...")
+        return ', '.join(names)
 
     def show(self, line):
         self.clear_status()
@@ -613,11 +638,9 @@ class TestProcess(object):
             file.write(message)
 
     def tail_error(self):
-        with open(join(self.dir, "stderr")) as f:
-            lines = f.read().split('\n')[-10:]
+        lines = tail_file_lines(join(self.dir, "stderr"), 10)
         if len(lines) < 10:
-            with open(join(self.dir, "stdout")) as f:
-                lines = f.read().split('\n')[-len(lines):] + lines
+            lines = tail_file_lines(join(self.dir, "stdout"), len(lines)) + lines
         return '\n'.join(lines)
 
     def supervise(self):
@@ -637,7 +660,7 @@ class TestProcess(object):
             self.write_fail_message("Test failed to exit after timeout of %d seconds" % self.timeout)
             self.runner.tell(TestRunner.FAILED, self.id, self)
         elif self.process.exitcode:
-            self.write_fail_message("Test exited abnormally with error code %d" % self.process.exitcode)
+            self.write_fail_message("Test exited abnormally with %s" % utils.format_exit_code(self.process.exitcode))
             self.runner.tell(TestRunner.FAILED, self.id, self)
         else:
             try:
@@ -668,7 +691,17 @@ class TestProcess(object):
                 os.killpg(pid, sig)
             except OSError:
                 break
-            time.sleep(2)
+            # give the group up to 2 seconds to exit, but move on as soon as it is gone
+            deadline = utils.monotonic() + 2
+            while utils.monotonic() < deadline:
+                if self.process.is_alive():
+                    self.process.join(0.1) # reap the group leader, killpg still finds it while it is a zombie
+                else:
+                    time.sleep(max(0, min(0.1, deadline - utils.monotonic())))
+                try:
+                    os.killpg(pid, 0)
+                except OSError:
+                    return
 
     def terminate(self, gracefull_kill=False):
         if gracefull_kill:
@@ -922,10 +955,8 @@ class TestTree(Test):
 # Used with `--load' to load old test results
 def load_test_results_as_tests(path):
     tests = TestTree()
-    for dir in os.listdir(path):
+    for dir in list_subdirs(path):
         full_dir = join(path, dir)
-        if not os.path.isdir(full_dir):
-            continue
         names = list(reversed(dir.split('.')))
         parent = tests
         while parent.has_test(names[-1]):
@@ -961,9 +992,8 @@ class OldTest(Test):
         return os.path.exists(join(self.dir, "killed"))
 
     def dump_file(self, name):
-        with file(join(self.dir, name)) as f:
-            for line in f:
-                print(line, end=' ')
+        with open(join(self.dir, name)) as f:
+            shutil.copyfileobj(f, sys.stdout)
 
     def dump_log(self):
         self.dump_file("stdout")
@@ -20,8 +20,10 @@ def format_tests(test_root, test_tree):
       for rel_path in test.list_files(text_only=False):
           path = os.path.join(test_root, name, rel_path)
           file_info = { 'name': os.path.join(name, rel_path) }
-          if utils.guess_is_text_file(path) and os.path.getsize(path) > 0:
-            file_info['contents'] = open(path, "rb").read()
+          with open(path, "rb") as f:
+            head = f.read(100)
+            if head and utils.guess_is_text_data(head):
+              file_info['contents'] = head + f.read()
           file_infos.append(file_info)
 
       tests.append({
@@ -33,14 +35,18 @@ def format_tests(test_root, test_tree):
   return sorted(tests, key = lambda t: t['name'])
 
 def generate_html(output_file, reportData):
-  file_out = open(output_file, 'w')
   mustachePath = os.path.realpath(os.path.join(os.path.dirname(__file__), 'mustache', 'mustache.js'))
-  mustacheContent = open(mustachePath).read()
-  pageHTML = test_report_template % {"pagedata": json.dumps(reportData, separators=(',', ':')), 'mustacheContents': mustacheContent}
-  file_out.write(pageHTML)
+  with open(mustachePath) as mustacheFile:
+    mustacheContent = mustacheFile.read()
+  # stream the page data, which includes every log file, straight into the output rather than building the page in memory
+  head, tail = test_report_template.split('%(pagedata)s')
+  with open(output_file, 'w') as file_out:
+    file_out.write(head % {'mustacheContents': mustacheContent})
+    json.dump(reportData, file_out, separators=(',', ':'))
+    file_out.write(tail % {})
 
-def check_output(command, shell=False):
-    process = subprocess.Popen(command, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+def check_output(command):
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     output, _ = process.communicate()
     if process.returncode != 0:
         raise subprocess.CalledProcessError(process.returncode, command)
@@ -54,8 +60,13 @@ def gen_report(test_root, tests):
       'build_link': os.environ['BUILD_URL']
     }
   
+  try:
+    branch = check_output(['git', 'symbolic-ref', 'HEAD'])
+  except subprocess.CalledProcessError:
+    branch = 'HEAD\n' # detached HEAD
+  
   git_info = {
-    'branch': check_output(['git symbolic-ref HEAD 2>/dev/null || echo "HEAD"'], shell=True),
+    'branch': branch,
     'commit': check_output(['git', 'rev-parse', 'HEAD']),
     'message': check_output(['git', 'show', '-s', '--format=%B'])
   }
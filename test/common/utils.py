@@ -3,7 +3,7 @@
 
 from __future__ import print_function
 
-import atexit, collections, fcntl, os, pprint, platform, random, re, shutil, signal
+import atexit, collections, errno, fcntl, os, pprint, platform, random, re, select, shutil, signal
 import socket, string, subprocess, sys, tempfile, threading, time, warnings
 
 import test_exceptions
@@ -83,9 +83,37 @@ resetDriverPaths() # pickup inital values
 # --
 
 # non-printable ascii characters and invalid utf8 bytes
-non_text_bytes = \
-  list(range(0x00, 0x09+1)) + [0x0B, 0x0C] + list(range(0x0F, 0x1F+1)) + \
-  [0xC0, 0xC1] + list(range(0xF5, 0xFF+1))
+non_text_bytes = frozenset(
+  list(range(0x00, 0x09+1)) + [0x0B, 0x0C] + list(range(0x0F, 0x1F+1)) +
+  [0xC0, 0xC1] + list(range(0xF5, 0xFF+1)))
+# the complement, as a deletion table for bytes.translate
+text_chars = bytes(bytearray(x for x in range(0x100) if x not in non_text_bytes))
+
+# a clock for deadlines that is not affected by changes to the system time
+try:
+    monotonic = time.monotonic
+except AttributeError: # Python 2
+    monotonic = time.time
+
+# Popen arguments that start the child in its own process group. Avoiding a Python preexec_fn
+# lets newer Pythons do the setup in C and use vfork rather than a full fork.
+if sys.version_info >= (3, 11):
+    new_process_group = {'process_group': 0}
+elif sys.version_info >= (3, 2):
+    new_process_group = {'start_new_session': True}
+else:
+    new_process_group = {'preexec_fn': os.setpgrp}
+
+# signal numbers to names, built once; where there are aliases the alphabetically first wins (SIGABRT over SIGIOT)
+signal_names = dict(
+    (int(getattr(signal, name)), name) for name in sorted(dir(signal), reverse=True)
+    if name.startswith('SIG') and not name.startswith('SIG_') and isinstance(getattr(signal, name), int))
+
+def format_exit_code(code):
+    '''describe a process return code, naming the signal for negative codes'''
+    if code < 0:
+        return 'signal %s' % signal_names.get(-code, -code)
+    return 'error code %d' % code
 
 startTime = time.time()
 def print_with_time(*args, **kwargs): # add timing information to print statements
@@ -93,13 +121,13 @@ def print_with_time(*args, **kwargs): # add timing information to print statemen
     print(*args, **kwargs)
     sys.stdout.flush()
 
+def guess_is_text_data(data):
+    # whatever is left after removing the text bytes is binary
+    return not data.translate(None, text_chars)
+
 def guess_is_text_file(name):
-    with file(name, 'rb') as f:
-        data = f.read(100)
-    for byte in data:
-        if ord(byte) in non_text_bytes:
-            return False
-    return True
+    with open(name, 'rb') as f:
+        return guess_is_text_data(f.read(100))
 
 def find_rethinkdb_executable(mode=None):
     result_path = os.environ.get('RDB_EXE_PATH') or os.path.join(latest_build_dir(check_executable=True, mode=mode), 'rethinkdb')
@@ -519,6 +547,41 @@ class RunningProcesses:
         targetProcesses.reverse() # so children go before their parents
         return targetProcesses
 
+def wait_for_process(process, timeout):
+    '''Wait up to timeout seconds for a subprocess.Popen to exit, returning its return code or None if it is still running'''
+    
+    if process.poll() is not None:
+        return process.returncode
+    if timeout <= 0:
+        return None
+    
+    # -- on Linux 5.3+ (Python 3.9+) let the kernel tell us when the process exits
+    
+    pidfd = None
+    if hasattr(os, 'pidfd_open') and hasattr(select, 'poll'):
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except OSError:
+            pass # older kernel, or the process has already been reaped
+    if pidfd is not None:
+        try:
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+            poller.poll(max(0, int(timeout * 1000))) # a negative timeout would block forever
+        finally:
+            os.close(pidfd)
+        return process.poll()
+    
+    # -- fall back to polling
+    
+    deadline = monotonic() + timeout
+    while process.poll() is None:
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(0.1, remaining))
+    return process.returncode
+
 def kill_process_group(parent, timeout=20, sigkill_grace=2, only_warn=True):
     '''make sure that the given process group id is not running'''
     
@@ -597,11 +660,12 @@ def kill_process_group(parent, timeout=20, sigkill_grace=2, only_warn=True):
             
     
     # - wait for the processes to gracefully terminate
-    while time.time() < cleanDeadline:
-        if parentPopen:
-            if parentPopen.poll() is not None:
-                break
-        else:
+    if parentPopen:
+        remaining = cleanDeadline - time.time()
+        if remaining > 0:
+            wait_for_process(parentPopen, remaining)
+    else:
+        while time.time() < cleanDeadline:
             try:
                 result = os.waitpid(parentPid, os.WNOHANG)
                 if result != (0, 0):
@@ -609,7 +673,7 @@ def kill_process_group(parent, timeout=20, sigkill_grace=2, only_warn=True):
             except OSError as e:
                 if e.errno == 10: # No such child
                     break
-        time.sleep(0.1)
+            time.sleep(0.1)
     
     # -- SIGINT all of the running processes
     while time.time() < softDeadline:
@@ -722,18 +786,18 @@ def atExitCleanup():
     '''Delete all of the paths that registered using cleanupPathAtExit.'''
     
     for path in pathsToClean:
-        if not os.path.exists(path):
-            continue
-        
-        elif os.path.isdir(path):
-            try:
-                shutil.rmtree(path)
-            except Exception as e:
-                sys.stdout.write('Warning: unable to cleanup folder: %s - got error: %s\n' % (str(path), str(e)))
-        elif os.path.isfile(path):
-            try:
-                os.unlink(path)
-            except Exception as e:
+        # unlink first: files and symlinks go in one syscall, and directories tell us via the errno
+        try:
+            os.unlink(path)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            elif e.errno in (errno.EISDIR, errno.EPERM): # EPERM is how OS X reports a directory
+                try:
+                    shutil.rmtree(path)
+                except Exception as e:
+                    sys.stdout.write('Warning: unable to cleanup folder: %s - got error: %s\n' % (str(path), str(e)))
+            else:
                 sys.stdout.write('Warning: unable to cleanup file: %s - got error: %s\n' % (str(path), str(e)))
 
 def cleanupPathAtExit(path):
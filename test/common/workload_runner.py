@@ -1,6 +1,6 @@
 # Copyright 2010-2015 RethinkDB, all rights reserved.
 
-import os, signal, subprocess, sys, time
+import os, signal, subprocess, sys, threading, time
 
 import utils, vcoptparse
 
@@ -34,38 +34,53 @@ def run(command_line, ports, timeout, db_name=None, table_name=None):
         ports = RDBPorts(host=ports.host, http_port=ports.http_port, rdb_port=ports.driver_port, db_name=db_name, table_name=table_name)
 
     start_time = time.time()
-    end_time = start_time + timeout
     utils.print_with_time("Running workload %r..." % command_line)
 
     # Set up environment
     new_environ = os.environ.copy()
     ports.add_to_environ(new_environ)
 
-    proc = subprocess.Popen(command_line, shell=True, env=new_environ, preexec_fn=lambda: os.setpgid(0, 0))
+    proc = subprocess.Popen(command_line, shell=True, env=new_environ, **utils.new_process_group)
 
-    try:
-        while time.time() < end_time:
-            result = proc.poll()
-            if result is None:
-                time.sleep(1)
-            elif result == 0:
-                utils.print_with_time("Done")
-                return
-            else:
-                utils.print_with_time("Failed")
-                sys.stderr.write("workload '%s' failed with error code %d\n" % (command_line, result))
-                exit(1)
-        sys.stderr.write("\nWorkload timed out after %d seconds (%s)\n"  % (time.time() - start_time, command_line))
-    finally:
+    def signal_group(sig):
         try:
-            os.killpg(proc.pid, signal.SIGTERM)
+            os.killpg(proc.pid, sig)
         except OSError:
             pass
+
+    # block in wait() and let timers interrupt the workload if it overruns, escalating to SIGKILL
+    # if it does not respond to SIGTERM, so that run() stays bounded without polling
+    sigterm_grace = 2 # seconds
+    timed_out = threading.Event()
+    kill_timer = threading.Timer(sigterm_grace, signal_group, args=[signal.SIGKILL])
+    def expire():
+        timed_out.set()
+        signal_group(signal.SIGTERM)
+        kill_timer.start()
+    timer = threading.Timer(timeout, expire)
+    timer.start()
+
+    try:
+        result = proc.wait()
+        if timed_out.is_set():
+            sys.stderr.write("\nWorkload timed out after %d seconds (%s)\n"  % (time.time() - start_time, command_line))
+        elif result == 0:
+            utils.print_with_time("Done")
+            return
+        else:
+            utils.print_with_time("Failed")
+            sys.stderr.write("workload '%s' failed with %s\n" % (command_line, utils.format_exit_code(result)))
+            exit(1)
+    finally:
+        timer.cancel()
+        kill_timer.cancel()
+        signal_group(signal.SIGTERM)
     exit(1)
 
 class ContinuousWorkload(object):
     
     running = False
+    interrupted = False
     ports = None
     
     def __init__(self, command_line, ports, db_name=None, table_name=None):
@@ -99,8 +114,9 @@ class ContinuousWorkload(object):
         new_environ = os.environ.copy()
         self.ports.add_to_environ(new_environ)
         
-        self.proc = subprocess.Popen(self.command_line, shell=True, env=new_environ, preexec_fn=os.setpgrp)
+        self.proc = subprocess.Popen(self.command_line, shell=True, env=new_environ, **utils.new_process_group)
         self.running = True
+        self.interrupted = False
 
         self.check()
 
@@ -109,27 +125,28 @@ class ContinuousWorkload(object):
         result = self.proc.poll()
         if result is not None:
             self.running = False
-            raise RuntimeError("workload '%s' stopped prematurely with error code %d" % (self.command_line, result))
+            raise RuntimeError("workload '%s' stopped prematurely with %s" % (self.command_line, utils.format_exit_code(result)))
 
-    def stop(self):
+    def interrupt(self):
+        '''Send SIGINT to the workload without waiting for it to exit, so several can be shut down at once'''
         self.check()
         utils.print_with_time("Stopping %r..." % self.command_line)
         os.killpg(self.proc.pid, signal.SIGINT)
+        self.interrupted = True
+
+    def stop(self):
+        if not self.interrupted:
+            self.interrupt()
         shutdown_grace_period = 10   # seconds
-        end_time = time.time() + shutdown_grace_period
-        while time.time() < end_time:
-            result = self.proc.poll()
-            if result is None:
-                time.sleep(1)
-            elif result == 0 or result == -signal.SIGINT:
-                utils.print_with_time("OK")
-                self.running = False
-                break
-            else:
-                self.running = False
-                raise RuntimeError("workload '%s' failed when interrupted with error code %d" % (self.command_line, result))
-        else:
+        result = utils.wait_for_process(self.proc, shutdown_grace_period)
+        if result is None:
             raise RuntimeError("workload '%s' failed to terminate within %d seconds of SIGINT" % (self.command_line, shutdown_grace_period))
+        elif result == 0 or result == -signal.SIGINT:
+            utils.print_with_time("OK")
+            self.running = False
+        else:
+            self.running = False
+            raise RuntimeError("workload '%s' failed when interrupted with %s" % (self.command_line, utils.format_exit_code(result)))
 
     def __exit__(self, exc = None, ty = None, tb = None):
         if self.running:
@@ -188,8 +205,13 @@ class SplitOrContinuousWorkload(object):
         assert self.opts["workload-during"]
         if seconds != 0:
             utils.print_with_time("Letting %s run for %d seconds..." % (" and ".join(repr(x) for x in self.opts["workload-during"]), seconds))
-            for i in xrange(seconds):
-                time.sleep(1)
+            # sleep against a deadline so the time spent in check() does not add up
+            deadline = utils.monotonic() + seconds
+            while True:
+                remaining = deadline - utils.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(1, remaining))
                 self.check()
     
     def run_before(self):
@@ -215,6 +237,9 @@ class SplitOrContinuousWorkload(object):
     def run_after(self):
         if self.opts["workload-during"]:
             self._spin_continuous_workloads(self.opts["extra-after"])
+            # interrupt all of the workloads first so their shutdowns overlap
+            for cwl in self.continuous_workloads:
+                cwl.interrupt()
             for cwl in self.continuous_workloads:
                 cwl.stop()
         if self.opts["workload-after"] is not None: